@@ -7,29 +7,61 @@ Python 3.11
 """
 
 from __future__ import annotations
+import contextlib
 import socket
 import struct
 import threading
 import sys
 
 _MAX_FRAME = 8 * 1024 * 1024
+# maior frame que o servidor aceita por padrão (--max-frame-kb); acima disso
+# ele derruba a conexão, então a linha é recusada aqui mesmo
+_MAX_SEND = 64 * 1024
+_HDR = struct.Struct("!I")
+# buffer de envio reaproveitado (só a thread principal envia)
+_send_buf = bytearray(_HDR.size + 4096)
+_SOCK_BUF = 2 * 1024 * 1024
+
+def tune_socket(sock: socket.socket) -> None:
+    # sem Nagle: cada linha digitada sai na hora; QUICKACK só existe no Linux.
+    # cada opção falha sozinha: uma recusada não pula as seguintes
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SOCK_BUF)
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCK_BUF)
+    if hasattr(socket, "TCP_QUICKACK"):
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
 
 def send_frame(conn: socket.socket, text: str) -> None:
     data = text.encode("utf-8", errors="replace")
     n = len(data)
-    if n > _MAX_FRAME:
-        raise ValueError("Mensagem excede o tamanho máximo permitido.")
-    header = struct.pack("!I", n)
-    conn.sendall(header + data)
+    if n > _MAX_SEND:
+        raise ValueError(f"Mensagem excede o tamanho máximo permitido ({_MAX_SEND // 1024} KB).")
+    size = _HDR.size + n
+    if len(_send_buf) < size:
+        _send_buf.extend(bytes(size - len(_send_buf)))
+    _HDR.pack_into(_send_buf, 0, n)
+    _send_buf[_HDR.size:size] = data
+    conn.sendall(memoryview(_send_buf)[:size])
+
+# buffer de recepção reaproveitado (só a thread leitora recebe)
+_recv_buf = bytearray(64 * 1024)
 
-def _recv_exact(conn: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = conn.recv(n - len(buf))
-        if not chunk:
+def _recv_exact(conn: socket.socket, n: int) -> memoryview:
+    global _recv_buf
+    if len(_recv_buf) < n:
+        _recv_buf = bytearray(n)
+    view = memoryview(_recv_buf)[:n]
+    pos = 0
+    while pos < n:
+        got = conn.recv_into(view[pos:])
+        if not got:
             raise ConnectionError("Conexão encerrada.")
-        buf.extend(chunk)
-    return bytes(buf)
+        pos += got
+    return view
 
 def recv_frame(conn: socket.socket) -> str | None:
     header = conn.recv(4)
@@ -37,13 +69,12 @@ def recv_frame(conn: socket.socket) -> str | None:
         return None
     if len(header) < 4:
         header += _recv_exact(conn, 4 - len(header))
-    (length,) = struct.unpack("!I", header)
+    (length,) = _HDR.unpack(header)
     if length > _MAX_FRAME:
         raise ValueError("Frame muito grande.")
     if length == 0:
         return ""
-    data = _recv_exact(conn, length)
-    return data.decode("utf-8", errors="replace")
+    return str(_recv_exact(conn, length), "utf-8", "replace")
 
 def reader_loop(conn: socket.socket):
     try:
@@ -74,6 +105,7 @@ def main():
     args = parser.parse_args()
 
     conn = socket.create_connection((args.host, args.port))
+    tune_socket(conn)
     print(f"[conectado a {args.host}:{args.port}]")
     threading.Thread(target=reader_loop, args=(conn,), daemon=True).start()
 
@@ -82,8 +114,14 @@ def main():
             line = line.rstrip("\n")
             if not line:
                 continue
-            send_frame(conn, line)
-            if line.strip().lower() == "/quit":
+            try:
+                send_frame(conn, line)
+            except ValueError as e:
+                print(f"[{e} Não enviada.]")
+                continue
+            # só linhas que começam com "/" pagam o lower() da checagem de /quit
+            cmd = line.lstrip()
+            if cmd[:1] == "/" and cmd.rstrip().lower() == "/quit":
                 break
     except KeyboardInterrupt:
         pass
@@ -15,67 +15,166 @@ import struct
 import socket
 import argparse
 import contextlib
-from typing import Optional
+from typing import Optional, Iterator
 
 import websockets  
 
-
-_MAX_FRAME = 8 * 1024 * 1024  
-
+try:
+    import uvloop
+except ImportError:  # opcional: sem uvloop usa o loop padrão do asyncio
+    uvloop = None
 
 
-def send_frame(conn: socket.socket, text: str) -> None:
+_MAX_FRAME = 8 * 1024 * 1024  
+# maior frame que o servidor aceita por padrão (--max-frame-kb); acima disso
+# ele derruba a conexão, então o bridge recusa a mensagem e avisa o navegador
+_MAX_SEND = 64 * 1024
+_HDR = struct.Struct("!I")
+# fila TCP->WS: pausa a leitura do TCP acima de HIGH e retoma abaixo de LOW
+_QUEUE_HIGH = 256
+_QUEUE_LOW = 64
+_SOCK_BUF = 2 * 1024 * 1024
+
+
+def tune_socket(sock: socket.socket) -> None:
+    """TCP_NODELAY + buffers maiores na perna TCP; TCP_QUICKACK só no Linux."""
+    # cada opção falha sozinha: uma recusada não pula as seguintes
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SOCK_BUF)
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _SOCK_BUF)
+    if hasattr(socket, "TCP_QUICKACK"):
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+
+
+
+def encode_frame(text: str, limit: int = _MAX_FRAME) -> bytes:
     data = text.encode("utf-8", errors="replace")
     n = len(data)
-    if n > _MAX_FRAME:
-        raise ValueError("Mensagem excede o tamanho máximo permitido.")
-    header = struct.pack("!I", n)
-    conn.sendall(header + data)
-
-
-def _recv_exact(conn: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = conn.recv(n - len(buf))
-        if not chunk:
-            raise ConnectionError("Conexão encerrada pelo par.")
-        buf.extend(chunk)
-    return bytes(buf)
-
-
-def recv_frame(conn: socket.socket) -> Optional[str]:
-    header = conn.recv(4)
-    if not header:
-        return None  # conexão fechada
-    if len(header) < 4:
-        header += _recv_exact(conn, 4 - len(header))
-    (length,) = struct.unpack("!I", header)
-    if length > _MAX_FRAME:
-        raise ValueError("Frame muito grande.")
-    if length == 0:
-        return ""
-    data = _recv_exact(conn, length)
-    return data.decode("utf-8", errors="replace")
+    if n > limit:
+        raise ValueError(f"Mensagem excede o tamanho máximo permitido ({limit // 1024} KB).")
+    return _HDR.pack(n) + data
 
 
+class FrameBuffer:
+    """
+    Buffer de recepção reaproveitado: o kernel escreve direto nele (recv_into)
+    e os frames são decodificados a partir de fatias, sem cópias intermediárias.
+    """
 
-class TCPChatConn:
-    def __init__(self, host: str, port: int):
-        self.host = host
-        self.port = port
-        self.sock: Optional[socket.socket] = None
+    __slots__ = ("buf", "head", "tail", "need")
+
+    def __init__(self, size: int = 64 * 1024) -> None:
+        self.buf = bytearray(size)
+        self.head = 0
+        self.tail = 0
+        self.need = _HDR.size  # bytes necessários para o próximo frame completo
+
+    def writable(self) -> memoryview:
+        pending = self.tail - self.head
+        if not pending:
+            self.head = self.tail = 0
+        elif self.head + self.need > len(self.buf):
+            if self.need > len(self.buf):
+                new = bytearray(max(self.need, 2 * len(self.buf)))
+                new[:pending] = memoryview(self.buf)[self.head:self.tail]
+                self.buf = new
+            else:
+                self.buf[:pending] = self.buf[self.head:self.tail]
+            self.head, self.tail = 0, pending
+        return memoryview(self.buf)[self.tail:]
+
+    def frames(self) -> Iterator[str]:
+        while True:
+            if self.tail - self.head < _HDR.size:
+                self.need = _HDR.size
+                return
+            (length,) = _HDR.unpack_from(self.buf, self.head)
+            if length > _MAX_FRAME:
+                raise ValueError("Frame muito grande.")
+            start = self.head + _HDR.size
+            end = start + length
+            if end > self.tail:
+                self.need = _HDR.size + length
+                return
+            self.head = end
+            yield str(memoryview(self.buf)[start:end], "utf-8", "replace")
+
+
+
+class TCPBridge(asyncio.BufferedProtocol):
+    """
+    Perna TCP do bridge rodando no próprio event loop (sem executor).
+    Frames completos vão para uma fila lida pela tarefa TCP->WS; se o
+    WebSocket ficar para trás, a leitura do TCP é pausada.
+    """
 
-    def connect(self) -> None:
-        self.sock = socket.create_connection((self.host, self.port))
+    def __init__(self) -> None:
+        self.rx = FrameBuffer()
+        self.frames: asyncio.Queue = asyncio.Queue()
+        self.transport: Optional[asyncio.Transport] = None
+        self._reading_paused = False
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            tune_socket(sock)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.rx.writable()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.rx.tail += nbytes
+        try:
+            for msg in self.rx.frames():
+                self.frames.put_nowait(msg)
+        except ValueError as e:
+            self.frames.put_nowait(e)
+            self.transport.close()
+            return
+        if not self._reading_paused and self.frames.qsize() >= _QUEUE_HIGH:
+            self._reading_paused = True
+            self.transport.pause_reading()
+
+    def eof_received(self) -> bool:
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.frames.put_nowait(None)  # conexão fechada
+        self._writable.set()
+
+    def pause_writing(self) -> None:
+        self._writable.clear()
+
+    def resume_writing(self) -> None:
+        self._writable.set()
+
+    async def recv(self) -> Optional[str]:
+        item = await self.frames.get()
+        if self._reading_paused and self.frames.qsize() <= _QUEUE_LOW:
+            self._reading_paused = False
+            if not self.transport.is_closing():
+                self.transport.resume_reading()
+        if isinstance(item, Exception):
+            raise item
+        return item
+
+    async def send(self, text: str) -> None:
+        if self.transport.is_closing():
+            raise ConnectionError("Conexão encerrada pelo par.")
+        self.transport.write(encode_frame(text, _MAX_SEND))
+        await self._writable.wait()
 
     def close(self) -> None:
-        if not self.sock:
-            return
-        with contextlib.suppress(Exception):
-            self.sock.shutdown(socket.SHUT_RDWR)
-        with contextlib.suppress(Exception):
-            self.sock.close()
-        self.sock = None
+        if self.transport:
+            with contextlib.suppress(Exception):
+                self.transport.close()
 
 
 
@@ -84,12 +183,11 @@ async def ws_handler(ws, chat_host: str, chat_port: int) -> None:
     Para cada cliente WebSocket criamos uma conexão TCP dedicada ao servidor de chat.
     O navegador envia/recebe texto; o bridge aplica/retira o framing de 4 bytes.
     """
-    tcp = TCPChatConn(chat_host, chat_port)
     loop = asyncio.get_running_loop()
 
 
     try:
-        tcp.connect()
+        _, tcp = await loop.create_connection(TCPBridge, chat_host, chat_port)
         await ws.send(f"[bridge] conectado ao chat TCP {chat_host}:{chat_port}")
     except Exception as e:
        
@@ -100,10 +198,10 @@ async def ws_handler(ws, chat_host: str, chat_port: int) -> None:
         return
 
     async def pump_tcp_to_ws():
-        """Lê frames do TCP (em executor) e envia para o WebSocket."""
+        """Lê frames do TCP (via TCPBridge, no próprio loop) e envia para o WebSocket."""
         try:
             while True:
-                msg = await loop.run_in_executor(None, lambda: recv_frame(tcp.sock))
+                msg = await tcp.recv()
                 if msg is None:
                     # TCP caiu/fechou
                     await ws.send("[bridge] desconectado do servidor de chat.")
@@ -120,7 +218,7 @@ async def ws_handler(ws, chat_host: str, chat_port: int) -> None:
                 await ws.close()
 
     async def pump_ws_to_tcp():
-        """Lê mensagens do WS e envia como frames para o TCP (em executor)."""
+        """Lê mensagens do WS e envia como frames para o TCP."""
         try:
             async for message in ws:
                 if not isinstance(message, str):
@@ -128,7 +226,10 @@ async def ws_handler(ws, chat_host: str, chat_port: int) -> None:
                         message = message.decode("utf-8", errors="replace")
                     else:
                         message = str(message)
-                await loop.run_in_executor(None, lambda: send_frame(tcp.sock, message))
+                try:
+                    await tcp.send(message)
+                except ValueError as e:
+                    await ws.send(f"[bridge] {e} Não enviada.")
         except asyncio.CancelledError:
             raise
         except Exception as e:
@@ -186,8 +287,10 @@ async def amain() -> None:
 
 
 def main() -> None:
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
     try:
-        asyncio.run(amain())
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(amain())
     except KeyboardInterrupt:
         print("\n[bridge] encerrado por KeyboardInterrupt")
 
@@ -1,370 +1,697 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 """
-Servidor de Chat Multithread com Salas + Message Framing (4 bytes)
+Servidor de Chat asyncio com Salas + Message Framing (4 bytes)
+Um único event loop atende todas as conexões (uvloop, se instalado).
 Com logging detalhado (conexões, comandos, mensagens, erros).
 Python 3.11+
 """
 
 from __future__ import annotations
+import asyncio
+import contextlib
 import socket
 import struct
-import threading
 import logging
 import logging.handlers
 import time
 import json
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Set, Tuple, List
+from typing import Optional, Dict, Set, Tuple, List, Iterator, Callable
+
+try:
+    import uvloop
+except ImportError:  # opcional: sem uvloop usa o loop padrão do asyncio
+    uvloop = None
 
 
 _MAX_FRAME = 8 * 1024 * 1024  # 8 MB
+_MAX_IN_FRAME = 64 * 1024  # maior frame aceito de um cliente; acima disso a conexão cai
+_MIN_IN_FRAME = 1024  # piso do limite acima: menos que isso recusaria até comandos
+_HDR = struct.Struct("!I")
+_HDR_PLACEHOLDER = bytes(_HDR.size)
+_SOCK_BUF = 2 * 1024 * 1024  # SO_SNDBUF/SO_RCVBUF por conexão
+_KEEPALIVE_IDLE = 60  # s sem tráfego até a primeira sonda
+_KEEPALIVE_INTVL = 10  # s entre sondas
+_KEEPALIVE_CNT = 6  # sondas sem resposta até derrubar a conexão
+_SHARED_FRAME_MIN = 16 * 1024  # frames a partir daqui não são copiados para o outbox
+_OUT_HIGH_WATER = 2 * _MAX_FRAME  # saída pendente máxima antes de derrubar um cliente lento
+_RX_BUF_SIZE = 16 * 1024  # buffer de recepção inicial por conexão
+_RX_BUF_MIN = 4 * 1024
+_RX_BUF_MAX = 256 * 1024
+_RX_SHRINK_READS = 8
+_RX_POOL_MAX = 256  # buffers de recepção guardados para reuso
+_SHUTDOWN_GRACE = 5.0  # s para os clientes escoarem a saída ao encerrar
+_DISCARD_GRACE = 5.0  # s lendo e descartando a entrada de quem será derrubado
+
+def tune_socket(sock, buf_size: int = _SOCK_BUF) -> None:
+    # sem Nagle: frames pequenos de chat saem na hora; QUICKACK só existe no Linux.
+    # buf_size=0 mantém o autoajuste de buffers do kernel.
+    # cada opção falha sozinha: uma recusada não pula as seguintes
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if buf_size > 0:
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, buf_size)
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, buf_size)
+    if hasattr(socket, "TCP_QUICKACK"):
+        with contextlib.suppress(OSError):
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+    # keepalive derruba pares mortos mesmo em salas sem tráfego;
+    # o ocioso padrão do kernel (2 h) é longo demais para um chat
+    with contextlib.suppress(OSError):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        for opt, val in ((socket.TCP_KEEPIDLE, _KEEPALIVE_IDLE),
+                         (socket.TCP_KEEPINTVL, _KEEPALIVE_INTVL),
+                         (socket.TCP_KEEPCNT, _KEEPALIVE_CNT)):
+            with contextlib.suppress(OSError):
+                sock.setsockopt(socket.IPPROTO_TCP, opt, val)
+
+def append_frame(buf: bytearray, text: str) -> None:
+    data = text.encode("utf-8", errors="replace")
+    n = len(data)
+    if n > _MAX_FRAME:
+        raise ValueError("Mensagem excede o tamanho máximo permitido.")
+    off = len(buf)
+    buf += _HDR_PLACEHOLDER
+    _HDR.pack_into(buf, off, n)
+    buf += data
 
-def send_frame(conn: socket.socket, text: str) -> None:
+def encode_frame(text: str) -> bytes:
     data = text.encode("utf-8", errors="replace")
     n = len(data)
     if n > _MAX_FRAME:
         raise ValueError("Mensagem excede o tamanho máximo permitido.")
-    header = struct.pack("!I", n)
-    conn.sendall(header + data)
-
-def _recv_exact(conn: socket.socket, n: int) -> bytes:
-    buf = bytearray()
-    while len(buf) < n:
-        chunk = conn.recv(n - len(buf))
-        if not chunk:
-            raise ConnectionError("Conexão encerrada pelo par.")
-        buf.extend(chunk)
-    return bytes(buf)
-
-def recv_frame(conn: socket.socket) -> Optional[str]:
-    header = conn.recv(4)
-    if not header:
-        return None
-    if len(header) < 4:
-        header += _recv_exact(conn, 4 - len(header))
-    (length,) = struct.unpack("!I", header)
-    if length > _MAX_FRAME:
-        raise ValueError("Frame muito grande (possível protocolo inválido).")
-    if length == 0:
+    return _HDR.pack(n) + data
+
+
+
+def _clip(s: Optional[str], limit: int) -> str:
+    if not s:
         return ""
-    data = _recv_exact(conn, length)
-    return data.decode("utf-8", errors="replace")
+    if len(s) <= limit:
+        return s
+    return f"{s[:limit]}... (+{len(s) - limit} chars)"
+
+
+
+# textos fixos já enquadrados no import; enviados sem reencodar a cada uso
+_WELCOME_FRAME = encode_frame(
+    "Bem-vindo ao servidor de chat!\n"
+    "Use /help para ver os comandos. Defina um apelido com /nick <nome>.\n"
+)
+_HELP_FRAME = encode_frame(
+    "Comandos disponíveis:\n"
+    "  /help                 Mostra esta ajuda\n"
+    "  /nick <nome>          Define seu apelido\n"
+    "  /create <sala>        Cria uma sala (se não existir)\n"
+    "  /join <sala>          Entra (ou cria e entra) em uma sala\n"
+    "  /rooms                Lista as salas ativas\n"
+    "  /leave                Sai da sala atual\n"
+    "  /who                  Lista membros da sua sala\n"
+    "  /quit                 Desconecta do servidor\n"
+    "Mensagens sem '/' são enviadas à sua sala atual.\n"
+)
+
+
+
+class FrameTooLarge(ValueError):
+    pass
+
+
+class FrameBuffer:
+    """
+    Buffer de recepção por conexão: o kernel escreve direto nele (recv_into)
+    e os frames são decodificados a partir de fatias, sem cópias intermediárias.
+    ``head``/``tail`` delimitam os bytes ainda não consumidos.
+    """
+
+    __slots__ = ("buf", "head", "tail", "need", "cap", "_low_reads", "discarding")
+
+    # buffers de conexões encerradas, reaproveitados pelas próximas
+    _pool: List[bytearray] = []
+
+    def __init__(self) -> None:
+        self.buf = self._pool.pop() if self._pool else bytearray(_RX_BUF_SIZE)
+        self.head = 0
+        self.tail = 0
+        self.need = _HDR.size  # bytes necessários para o próximo frame completo
+        # capacidade desejada: dobra quando uma leitura sozinha atinge ``cap``,
+        # cai pela metade após _RX_SHRINK_READS leituras abaixo de 1/4 dela
+        self.cap = len(self.buf)
+        self._low_reads = 0
+        self.discarding = False
+
+    def discard_input(self) -> None:
+        # daqui em diante tudo que chega é jogado fora sem ser enquadrado
+        self.discarding = True
+        self.head = self.tail = 0
+        self.need = _HDR.size
+
+    def release(self) -> None:
+        # buffers maiores que o tamanho inicial não voltam ao pool
+        if len(self.buf) <= _RX_BUF_SIZE and len(self._pool) < _RX_POOL_MAX:
+            self._pool.append(self.buf)
+        self.buf = bytearray()
+        self.head = self.tail = 0
+
+    def writable(self) -> memoryview:
+        pending = self.tail - self.head
+        want = max(self.cap, self.need)
+        if len(self.buf) != want and pending <= want:
+            new = bytearray(want)
+            new[:pending] = memoryview(self.buf)[self.head:self.tail]
+            self.buf = new
+            self.head, self.tail = 0, pending
+        elif not pending:
+            self.head = self.tail = 0
+        elif self.head + self.need > len(self.buf):
+            self.buf[:pending] = self.buf[self.head:self.tail]
+            self.head, self.tail = 0, pending
+        return memoryview(self.buf)[self.tail:]
+
+    def advance(self, nbytes: int) -> None:
+        self.tail += nbytes
+        # só conta como cheia a leitura que ocupa a capacidade inteira: o espaço
+        # oferecido após ``tail`` pode ser de poucos bytes e não indica carga
+        if nbytes >= self.cap:
+            self.cap = min(self.cap * 2, _RX_BUF_MAX)
+            self._low_reads = 0
+        elif nbytes < self.cap // 4:
+            self._low_reads += 1
+            if self._low_reads >= _RX_SHRINK_READS:
+                self.cap = max(self.cap // 2, _RX_BUF_MIN)
+                self._low_reads = 0
+        else:
+            self._low_reads = 0
+
+    def frames(self, max_frame: int = _MAX_IN_FRAME) -> Iterator[str]:
+        while True:
+            if self.tail - self.head < _HDR.size:
+                self.need = _HDR.size
+                return
+            (length,) = _HDR.unpack_from(self.buf, self.head)
+            # checado antes de crescer o buffer: um prefixo de 4 GB não aloca nada
+            if length > max_frame:
+                raise FrameTooLarge(length)
+            start = self.head + _HDR.size
+            end = start + length
+            if end > self.tail:
+                self.need = _HDR.size + length
+                return
+            self.head = end
+            yield str(memoryview(self.buf)[start:end], "utf-8", "replace")
 
 
 
-@dataclass(eq=False)
+@dataclass(eq=False, slots=True)
 class Client:
-    conn: socket.socket
+    transport: asyncio.Transport
     addr: Tuple[str, int]
     nickname: str = field(default_factory=lambda: "anon")
     room: Optional[str] = None
     alive: bool = True
+    # frames enfileirados neste tick do loop; flush() os envia num único write
+    out: bytearray = field(default_factory=bytearray, repr=False)
+    _flush_scheduled: bool = field(default=False, repr=False)
+    # "[sala] apelido: " já formatado; refeito só em /join, /leave e /nick
+    prefix: str = field(default="", repr=False)
+    # "ip:porta|apelido" usado nos logs; refeito só quando o apelido muda
+    cid: str = field(default="", repr=False)
+    # derrubado por acumular saída demais (não lê o que a sala envia)
+    overflowed: bool = field(default=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self.cid = f"{self.addr[0]}:{self.addr[1]}|{self.nickname or 'anon'}"
+
+    def set_nickname(self, nickname: str) -> None:
+        self.nickname = nickname
+        self.cid = f"{self.addr[0]}:{self.addr[1]}|{nickname or 'anon'}"
+        self.refresh_prefix()
+
+    def refresh_prefix(self) -> None:
+        self.prefix = f"[{self.room}] {self.nickname}: " if self.room else ""
 
     def send(self, msg: str) -> None:
+        if self.transport.is_closing() or self._over_high_water(len(msg)):
+            self.alive = False
+            return
+        try:
+            append_frame(self.out, msg)
+        except Exception:
+            self.alive = False
+            return
+        self._schedule_flush()
+
+    def send_frame(self, frame: bytes) -> None:
+        """Enfileira um frame já codificado (o mesmo objeto serve a todos da sala)."""
+        if self.transport.is_closing() or self._over_high_water(len(frame)):
+            self.alive = False
+            return
+        if len(frame) < _SHARED_FRAME_MIN:
+            self.out += frame
+            self._schedule_flush()
+            return
+        # frame grande: escoa o que já está no outbox (mantém a ordem) e entrega
+        # o próprio objeto ao transporte, sem copiá-lo por destinatário
+        self.flush()
         try:
-            send_frame(self.conn, msg)
+            self.transport.write(frame)
+        except Exception:
+            self.alive = False
+
+    def _over_high_water(self, extra: int) -> bool:
+        # o outbox e o buffer do transporte só crescem para quem não lê; acima do
+        # limite o cliente é abortado (close() esperaria escoar o que nunca escoa)
+        if self.transport.get_write_buffer_size() + len(self.out) + extra <= _OUT_HIGH_WATER:
+            return False
+        self.overflowed = True
+        self.out = bytearray()
+        self.transport.abort()
+        return True
+
+    def _schedule_flush(self) -> None:
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self) -> None:
+        self._flush_scheduled = False
+        if not self.out:
+            return
+        buf, self.out = self.out, bytearray()
+        if self.transport.is_closing():
+            self.alive = False
+            return
+        try:
+            self.transport.write(buf)
         except Exception:
             self.alive = False
 
 
 
 class ChatServer:
+    """
+    Todo o estado (salas e clientes) vive em um único event loop asyncio:
+    como só a thread do loop toca em ``rooms``/``clients``, não há locks.
+    """
+
     def __init__(
         self,
         host: str = "0.0.0.0",
         port: int = 5050,
         *,
         max_log_chars: int = 200,
+        sock_buf: int = _SOCK_BUF,
+        backlog: int = socket.SOMAXCONN,
+        max_frame: int = _MAX_IN_FRAME,
         logger: Optional[logging.Logger] = None,
     ):
         self.host = host
         self.port = port
-        self.sock: Optional[socket.socket] = None
+        self.sock_buf = sock_buf
+        self.backlog = backlog
+        self.max_frame = min(max(max_frame, _MIN_IN_FRAME), _MAX_FRAME)
+        self.server: Optional[asyncio.Server] = None
 
         
-        self.lock = threading.Lock()
-        self.clients: Dict[socket.socket, Client] = {}
+        self.clients: Set[Client] = set()
         self.rooms: Dict[str, Set[Client]] = {}
+        # /rooms em cache: refeito só quando _rooms_gen muda (create/join/leave)
+        self._rooms_gen = 0
+        self._rooms_listing = ""
+        self._rooms_frame = b""  # _rooms_listing + "\n" já codificado como frame
+        self._rooms_listing_gen = -1
 
        
-        self._shutdown = threading.Event()
+        self._shutdown = False
+        # setado quando o último cliente sai depois do shutdown()
+        self._drained = asyncio.Event()
 
       
         self.log = logger or logging.getLogger("chatserver")
         self.max_log_chars = max_log_chars
-
-    
-    def _clip(self, s: str) -> str:
-        if s is None:
-            return ""
-        if len(s) <= self.max_log_chars:
-            return s
-        return s[: self.max_log_chars] + f"... (+{len(s)-self.max_log_chars} chars)"
-
-    def _client_id(self, c: Client) -> str:
-        return f"{c.addr[0]}:{c.addr[1]}|{c.nickname or 'anon'}"
+        # evita montar argumentos de log.debug (_clip) fora do DEBUG
+        self._dbg = self.log.isEnabledFor(logging.DEBUG)
+
+        # despacho O(1) por nome de comando (aliases apontam para o mesmo handler)
+        self._commands: Dict[str, Callable[[Client, List[str]], None]] = {
+            "/help": self._cmd_help,
+            "/h": self._cmd_help,
+            "/?": self._cmd_help,
+            "/nick": self._cmd_nick,
+            "/create": self._cmd_create,
+            "/join": self._cmd_join,
+            "/rooms": self._cmd_rooms,
+            "/leave": self._cmd_leave,
+            "/who": self._cmd_who,
+            "/quit": self._cmd_quit,
+        }
 
     
     def create_room(self, name: str) -> bool:
-        with self.lock:
-            if name in self.rooms:
-                self.log.debug("create_room: já existe room=%s", name)
-                return False
-            self.rooms[name] = set()
-            self.log.info("room_created room=%s", name)
-            return True
+        if name in self.rooms:
+            self.log.debug("create_room: já existe room=%s", name)
+            return False
+        self.rooms[name] = set()
+        self._rooms_gen += 1
+        self.log.info("room_created room=%s", name)
+        return True
 
     def join_room(self, client: Client, room: str) -> str:
         prev_to_notify: Optional[str] = None
-        with self.lock:
-            if room not in self.rooms:
-                self.rooms[room] = set()
-                self.log.info("room_created (auto) room=%s by=%s", room, self._client_id(client))
+        if room not in self.rooms:
+            self.rooms[room] = set()
+            self.log.info("room_created (auto) room=%s by=%s", room, client.cid)
 
-            if client.room and client in self.rooms.get(client.room, set()):
-                prev_to_notify = client.room
-                self.rooms[client.room].discard(client)
-                self.log.info("room_leave room=%s client=%s", prev_to_notify, self._client_id(client))
+        if client.room and client in self.rooms.get(client.room, set()):
+            prev_to_notify = client.room
+            self.rooms[client.room].discard(client)
+            self.log.info("room_leave room=%s client=%s", prev_to_notify, client.cid)
 
-            self.rooms[room].add(client)
-            client.room = room
-            joined_room = room
+        self.rooms[room].add(client)
+        self._rooms_gen += 1
+        client.room = room
+        client.refresh_prefix()
 
-      
         if prev_to_notify:
             self._broadcast(prev_to_notify, f"* {client.nickname} saiu da sala.")
-        self._broadcast(joined_room, f"* {client.nickname} entrou na sala.")
-        self.log.info("room_join room=%s client=%s", joined_room, self._client_id(client))
-        return joined_room
+        self._broadcast(room, f"* {client.nickname} entrou na sala.")
+        self.log.info("room_join room=%s client=%s", room, client.cid)
+        return room
 
     def leave_room(self, client: Client) -> None:
         room_to_notify: Optional[str] = None
-        with self.lock:
-            if client.room and client in self.rooms.get(client.room, set()):
-                room_to_notify = client.room
-                self.rooms[client.room].discard(client)
-                client.room = None
-                self.log.info("room_leave room=%s client=%s", room_to_notify, self._client_id(client))
+        if client.room and client in self.rooms.get(client.room, set()):
+            room_to_notify = client.room
+            self.rooms[client.room].discard(client)
+            self._rooms_gen += 1
+            client.room = None
+            client.refresh_prefix()
+            self.log.info("room_leave room=%s client=%s", room_to_notify, client.cid)
 
         
         if room_to_notify:
             self._broadcast(room_to_notify, f"* {client.nickname} saiu da sala.")
 
+    def _refresh_rooms_listing(self) -> None:
+        if self._rooms_listing_gen == self._rooms_gen:
+            return
+        parts = [f"- {r} ({len(members)} online)" for r, members in self.rooms.items()]
+        self._rooms_listing = "Salas:\n" + ("\n".join(parts) if parts else "(nenhuma)")
+        self._rooms_frame = encode_frame(self._rooms_listing + "\n")
+        self._rooms_listing_gen = self._rooms_gen
+        self.log.debug("rooms_list_rebuilt count=%d", len(parts))
+
     def list_rooms(self) -> str:
-        with self.lock:
-            parts = [f"- {r} ({len(members)} online)" for r, members in self.rooms.items()]
-        self.log.debug("rooms_list count=%d", len(parts))
-        return "Salas:\n" + ("\n".join(parts) if parts else "(nenhuma)")
+        self._refresh_rooms_listing()
+        return self._rooms_listing
 
    
     def _broadcast(self, room: str, msg: str, *, sender: Optional[Client] = None) -> None:
-        with self.lock:
-            targets = list(self.rooms.get(room, set()))
+        # Client.send_frame nunca mexe em self.rooms, então dá para iterar o
+        # set da sala diretamente, sem copiar os membros a cada mensagem
+        try:
+            frame = encode_frame(msg)
+        except ValueError:
+            self.log.warning("broadcast_too_large room=%s chars=%d", room, len(msg))
+            return
+        targets = self.rooms.get(room, ())
         dead: List[Client] = []
         for c in targets:
-            c.send(msg)
+            c.send_frame(frame)
             if not c.alive:
                 dead.append(c)
-        if dead:
-            with self.lock:
-                for c in dead:
-                    self.rooms.get(room, set()).discard(c)
-                    self.clients.pop(c.conn, None)
-        self.log.debug(
-            "broadcast room=%s size=%d from=%s msg=%s",
-            room, len(targets),
-            self._client_id(sender) if sender else "server",
-            self._clip(msg),
-        )
+        # a limpeza de quem morreu fica para o connection_lost (_on_disconnect);
+        # aqui só garantimos que o transporte feche para ele ser chamado
+        for c in dead:
+            c.transport.close()
+        if self._dbg:
+            self.log.debug(
+                "broadcast room=%s size=%d from=%s msg=%s",
+                room, len(targets),
+                sender.cid if sender else "server",
+                _clip(msg, self.max_log_chars),
+            )
 
     
-    def start(self) -> None:
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind((self.host, self.port))
-        self.sock.listen()
-        self.log.info("server_listen host=%s port=%d", self.host, self.port)
+    async def start(self) -> None:
+        self._dbg = self.log.isEnabledFor(logging.DEBUG)
+        loop = asyncio.get_running_loop()
+        self.server = await loop.create_server(
+            lambda: _ClientProtocol(self), self.host, self.port,
+            reuse_address=True,
+            # o loop aceita até `backlog` conexões por wakeup do listener
+            backlog=self.backlog,
+        )
+        self.log.info("server_listen host=%s port=%d loop=%s",
+                      self.host, self.port, type(loop).__module__)
 
         try:
-            while not self._shutdown.is_set():
-                try:
-                    conn, addr = self.sock.accept()
-                except OSError:
-                    break
-                client = Client(conn=conn, addr=addr)
-                with self.lock:
-                    self.clients[conn] = client
-                self.log.info("client_connected addr=%s:%d", addr[0], addr[1])
-                threading.Thread(
-                    target=self._handle_client,
-                    name=f"client-{addr[0]}:{addr[1]}",
-                    args=(client,),
-                    daemon=True,
-                ).start()
+            # create_server já começou a aceitar; não usamos serve_forever() porque,
+            # a partir do 3.12.1, ao ser cancelado ele mesmo espera wait_closed(),
+            # que só retorna quando todas as conexões caíram: com clientes ligados
+            # o Ctrl+C travaria antes de chegarmos ao shutdown()
+            await loop.create_future()
         finally:
             self.shutdown()
+            # espera os clientes escoarem a saída e passarem pelo connection_lost;
+            # wait_closed() não serve para isso: até o 3.12.0 ele retorna assim
+            # que o listener fecha, sem esperar as conexões
+            if self.clients:
+                try:
+                    await asyncio.wait_for(self._drained.wait(), _SHUTDOWN_GRACE)
+                except asyncio.TimeoutError:
+                    # quem não leu a saída pendente a tempo não segura o encerramento
+                    for c in list(self.clients):
+                        c.transport.abort()
+                    # abort() agenda o connection_lost; deixa ele rodar
+                    await asyncio.sleep(0)
+            await self.server.wait_closed()
 
     def shutdown(self) -> None:
-        if self._shutdown.is_set():
+        if self._shutdown:
             return
-        self._shutdown.set()
+        self._shutdown = True
         self.log.info("server_shutdown_initiated")
-        if self.sock:
+        if self.server:
             try:
-                self.sock.close()
+                self.server.close()
             except Exception:
                 pass
-        with self.lock:
-            clients = list(self.clients.values())
+        clients = list(self.clients)
         for c in clients:
             try:
-                c.conn.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
-            try:
-                c.conn.close()
+                c.flush()
+                c.transport.close()
             except Exception:
                 pass
         self.log.info("server_shutdown_complete active_clients=%d", len(clients))
 
    
-    def _handle_client(self, client: Client) -> None:
-        client.send(
-            "Bem-vindo ao servidor de chat!\n"
-            "Use /help para ver os comandos. Defina um apelido com /nick <nome>.\n"
-        )
+    def _on_connect(self, transport: asyncio.Transport) -> Client:
+        peer = transport.get_extra_info("peername") or ("?", 0)
+        client = Client(transport=transport, addr=(peer[0], peer[1]))
+        self.clients.add(client)
+        self.log.info("client_connected addr=%s:%d", client.addr[0], client.addr[1])
+        client.send_frame(_WELCOME_FRAME)
+        return client
+
+    def _handle_frames(self, client: Client, rx: FrameBuffer) -> None:
         try:
-            while client.alive and not self._shutdown.is_set():
-                msg = recv_frame(client.conn)
-                if msg is None:
-                    self.log.info("client_disconnected %s", self._client_id(client))
+            for msg in rx.frames(self.max_frame):
+                if not client.alive or self._shutdown:
                     break
                 raw = msg
                 msg = msg.strip()
                 if not msg:
-                    self.log.debug("client_empty_msg %s", self._client_id(client))
+                    if self._dbg:
+                        self.log.debug("client_empty_msg %s", client.cid)
                     continue
 
-                self.log.debug("client_recv %s room=%s msg=%s",
-                               self._client_id(client), client.room, self._clip(raw))
+                if self._dbg:
+                    self.log.debug("client_recv %s room=%s msg=%s",
+                                   client.cid, client.room, _clip(raw, self.max_log_chars))
 
-                if msg.startswith("/"):
+                if msg[:1] == "/":
                     self._handle_command(client, msg)
                 else:
                     if not client.room:
                         client.send("! Você não está em nenhuma sala. Use /join <sala>.\n")
                         self.log.warning("msg_no_room %s msg=%s",
-                                         self._client_id(client), self._clip(msg))
+                                         client.cid, _clip(msg, self.max_log_chars))
                         continue
-                    self._broadcast(client.room, f"[{client.room}] {client.nickname}: {msg}", sender=client)
-        except (ConnectionError, OSError) as e:
-            self.log.info("client_io_error %s err=%s", self._client_id(client), repr(e))
+                    self._broadcast(client.room, client.prefix + msg, sender=client)
+        except FrameTooLarge as e:
+            self.log.warning("client_frame_too_large %s bytes=%d", client.cid, e.args[0])
+            client.send("! Mensagem excede o tamanho máximo permitido.\n")
+            self._close_after_reply(client, rx)
+            return
         except Exception:
             client.send("! Erro interno no servidor.\n")
-            self.log.exception("client_exception %s", self._client_id(client))
-        finally:
-            
-            self.leave_room(client)
-            with self.lock:
-                self.clients.pop(client.conn, None)
-            try:
-                client.conn.close()
-            except Exception:
-                pass
-            self.log.info("client_handler_end %s", self._client_id(client))
+            client.alive = False
+            self.log.exception("client_exception %s", client.cid)
+        client.flush()
+        if not client.alive:
+            client.transport.close()
+
+    def _close_after_reply(self, client: Client, rx: FrameBuffer) -> None:
+        # o payload recusado ainda está chegando: fechar com bytes não lidos faz o
+        # kernel mandar RST e a resposta se perde. A resposta sai seguida de FIN e
+        # a entrada é lida e descartada até o cliente fechar (eof_received), com
+        # prazo para quem continuar mandando
+        client.alive = False
+        self.leave_room(client)
+        rx.discard_input()
+        client.flush()
+        transport = client.transport
+        if transport.can_write_eof():
+            transport.write_eof()
+            asyncio.get_running_loop().call_later(_DISCARD_GRACE, transport.abort)
+        else:
+            transport.close()
+
+    def _on_disconnect(self, client: Client, exc: Optional[Exception]) -> None:
+        if client.overflowed:
+            self.log.warning("client_dropped_slow %s", client.cid)
+        elif exc is None:
+            self.log.info("client_disconnected %s", client.cid)
+        else:
+            self.log.info("client_io_error %s err=%s", client.cid, repr(exc))
+        client.alive = False
+        self.leave_room(client)
+        self.clients.discard(client)
+        self.log.info("client_handler_end %s", client.cid)
+        if self._shutdown and not self.clients:
+            self._drained.set()
 
-    
     def _handle_command(self, client: Client, line: str) -> None:
-        parts = line.split()
-        cmd = parts[0].lower()
+        parts = line.split(None, 1)
+        if len(parts) > 1:
+            # apelidos e salas vão para o começo de linhas de outros clientes:
+            # quebras de linha e outros controles forjariam linhas
+            # ("x\n[geral] admin"), então espaços viram um só e o resto sai
+            arg = " ".join(parts[1].split())
+            if not arg.isprintable():
+                arg = "".join(ch for ch in arg if ch.isprintable())
+            parts = [parts[0], arg] if arg else [parts[0]]
+        cmd = parts[0]
+        handler = self._commands.get(cmd)
+        if handler is None:
+            # as chaves já são minúsculas: só quem digita fora do padrão paga o lower()
+            cmd = cmd.lower()
+            handler = self._commands.get(cmd)
         self.log.info("command %s cmd=%s args=%s room=%s",
-                      self._client_id(client), cmd, parts[1:], client.room)
-
-        if cmd in ("/help", "/h", "/?"):
-            client.send(
-                "Comandos disponíveis:\n"
-                "  /help                 Mostra esta ajuda\n"
-                "  /nick <nome>          Define seu apelido\n"
-                "  /create <sala>        Cria uma sala (se não existir)\n"
-                "  /join <sala>          Entra (ou cria e entra) em uma sala\n"
-                "  /rooms                Lista as salas ativas\n"
-                "  /leave                Sai da sala atual\n"
-                "  /who                  Lista membros da sua sala\n"
-                "  /quit                 Desconecta do servidor\n"
-                "Mensagens sem '/' são enviadas à sua sala atual.\n"
-            )
+                      client.cid, cmd, parts[1:], client.room)
+        if handler is None:
+            client.send(f"Comando desconhecido: {cmd}. Use /help.\n")
+            self.log.warning("unknown_command %s cmd=%s", client.cid, cmd)
             return
+        handler(client, parts)
 
-        if cmd == "/nick":
-            if len(parts) < 2:
-                client.send("Uso: /nick <nome>\n")
-                return
-            new = parts[1][:32]
-            with self.lock:
-                old = client.nickname
-                client.nickname = new
-            client.send(f"Apelido alterado: {old} -> {new}\n")
-            if client.room:
-                self._broadcast(client.room, f"* {old} agora é {new}.")
-            self.log.info("nick_change %s old=%s new=%s", self._client_id(client), old, new)
-            return
+    def _cmd_help(self, client: Client, parts: List[str]) -> None:
+        client.send_frame(_HELP_FRAME)
 
-        if cmd == "/create":
-            if len(parts) < 2:
-                client.send("Uso: /create <sala>\n")
-                return
-            room = parts[1][:48]
-            created = self.create_room(room)
-            if created:
-                client.send(f"Sala criada: {room}\n")
-            else:
-                client.send(f"Sala '{room}' já existe.\n")
+    def _cmd_nick(self, client: Client, parts: List[str]) -> None:
+        if len(parts) < 2:
+            client.send("Uso: /nick <nome>\n")
             return
-
-        if cmd == "/join":
-            if len(parts) < 2:
-                client.send("Uso: /join <sala>\n")
-                return
-            room = parts[1][:48]
-            joined = self.join_room(client, room)
-            client.send(f"Entrou na sala: {joined}\n")
+        new = parts[1][:32]
+        old = client.nickname
+        client.set_nickname(new)
+        client.send(f"Apelido alterado: {old} -> {new}\n")
+        if client.room:
+            self._broadcast(client.room, f"* {old} agora é {new}.")
+        self.log.info("nick_change %s old=%s new=%s", client.cid, old, new)
+
+    def _cmd_create(self, client: Client, parts: List[str]) -> None:
+        if len(parts) < 2:
+            client.send("Uso: /create <sala>\n")
             return
-
-        if cmd == "/rooms":
-            client.send(self.list_rooms() + "\n")
+        room = parts[1][:48]
+        created = self.create_room(room)
+        if created:
+            client.send(f"Sala criada: {room}\n")
+        else:
+            client.send(f"Sala '{room}' já existe.\n")
+
+    def _cmd_join(self, client: Client, parts: List[str]) -> None:
+        if len(parts) < 2:
+            client.send("Uso: /join <sala>\n")
             return
+        room = parts[1][:48]
+        joined = self.join_room(client, room)
+        client.send(f"Entrou na sala: {joined}\n")
 
-        if cmd == "/leave":
-            if not client.room:
-                client.send("Você não está em nenhuma sala.\n")
-                return
-            self.leave_room(client)
-            client.send("Você saiu da sala.\n")
+    def _cmd_rooms(self, client: Client, parts: List[str]) -> None:
+        self._refresh_rooms_listing()
+        client.send_frame(self._rooms_frame)
+
+    def _cmd_leave(self, client: Client, parts: List[str]) -> None:
+        if not client.room:
+            client.send("Você não está em nenhuma sala.\n")
             return
+        self.leave_room(client)
+        client.send("Você saiu da sala.\n")
 
-        if cmd == "/who":
-            if not client.room:
-                client.send("Você não está em nenhuma sala.\n")
-                return
-            with self.lock:
-                members = [c.nickname for c in self.rooms.get(client.room, set())]
-            client.send("Membros na sala:\n" + "\n".join(f" - {m}" for m in members) + "\n")
-            self.log.debug("who room=%s members=%d requester=%s",
-                           client.room, len(members), self._client_id(client))
+    def _cmd_who(self, client: Client, parts: List[str]) -> None:
+        if not client.room:
+            client.send("Você não está em nenhuma sala.\n")
             return
+        members = [c.nickname for c in self.rooms.get(client.room, set())]
+        client.send("Membros na sala:\n" + "\n".join(f" - {m}" for m in members) + "\n")
+        if self._dbg:
+            self.log.debug("who room=%s members=%d requester=%s",
+                           client.room, len(members), client.cid)
 
-        if cmd == "/quit":
-            client.send("Até mais!\n")
-            client.alive = False
-            try:
-                client.conn.shutdown(socket.SHUT_RDWR)
-            except Exception:
-                pass
+    def _cmd_quit(self, client: Client, parts: List[str]) -> None:
+        client.send("Até mais!\n")
+        client.alive = False
+
+
+
+class _ClientProtocol(asyncio.BufferedProtocol):
+    """Liga um transporte asyncio ao ChatServer; o estado do chat fica no servidor."""
+
+    def __init__(self, server: ChatServer) -> None:
+        self.server = server
+        self.rx = FrameBuffer()
+        self.client: Optional[Client] = None
+        self.transport: Optional[asyncio.Transport] = None
+
+    def connection_made(self, transport: asyncio.BaseTransport) -> None:
+        self.transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            tune_socket(sock, self.server.sock_buf)
+        self.client = self.server._on_connect(transport)
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.rx.writable()
+
+    def buffer_updated(self, nbytes: int) -> None:
+        if self.rx.discarding:
+            self.rx.discard_input()
             return
+        self.rx.advance(nbytes)
+        self.server._handle_frames(self.client, self.rx)
+
+    def eof_received(self) -> bool:
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        self.server._on_disconnect(self.client, exc)
+        self.rx.release()
+
+    # backpressure: para de ler do cliente enquanto a saída dele não escoar
+    def pause_writing(self) -> None:
+        self.transport.pause_reading()
 
-        client.send(f"Comando desconhecido: {cmd}. Use /help.\n")
-        self.log.warning("unknown_command %s cmd=%s", self._client_id(client), cmd)
+    def resume_writing(self) -> None:
+        if not self.transport.is_closing():
+            self.transport.resume_reading()
 
 
 
@@ -419,7 +746,15 @@ if __name__ == "__main__":
     parser.add_argument("--log-rotate-mb", type=int, default=20, help="Tamanho de rotação (MB)")
     parser.add_argument("--log-backups", type=int, default=5, help="Qntd de arquivos de backup")
     parser.add_argument("--max-log-chars", type=int, default=200, help="Truncar mensagens longas no log")
+    parser.add_argument("--sock-buf-kb", type=int, default=_SOCK_BUF // 1024,
+                        help="SO_SNDBUF/SO_RCVBUF por conexão em KB (0 = padrão do kernel)")
+    parser.add_argument("--backlog", type=int, default=socket.SOMAXCONN,
+                        help=f"Fila de conexões pendentes do listen (padrão: {socket.SOMAXCONN})")
+    parser.add_argument("--max-frame-kb", type=int, default=_MAX_IN_FRAME // 1024,
+                        help="Maior mensagem aceita de um cliente em KB (acima disso a conexão cai)")
     args = parser.parse_args()
+    if not _MIN_IN_FRAME // 1024 <= args.max_frame_kb <= _MAX_FRAME // 1024:
+        parser.error(f"--max-frame-kb deve estar entre {_MIN_IN_FRAME // 1024} e {_MAX_FRAME // 1024}")
 
     logger = _setup_logger(
         log_file=args.log_file,
@@ -433,10 +768,16 @@ if __name__ == "__main__":
         host=args.host,
         port=args.port,
         max_log_chars=args.max_log_chars,
+        sock_buf=args.sock_buf_kb * 1024,
+        backlog=args.backlog,
+        max_frame=args.max_frame_kb * 1024,
         logger=logger,
     )
+    # uvloop (libuv) quando disponível; o Runner o usa sem trocar a policy global
+    loop_factory = uvloop.new_event_loop if uvloop is not None else None
     try:
-        server.start()
+        with asyncio.Runner(loop_factory=loop_factory) as runner:
+            runner.run(server.start())
     except KeyboardInterrupt:
         logger.info("keyboard_interrupt")
         server.shutdown()